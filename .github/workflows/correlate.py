@@ -1,5 +1,57 @@
-import json, os, hashlib
-from datetime import datetime
+import os, hashlib
+import orjson
+from datetime import datetime, timezone
+import numpy as np
+
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    # Fall back to the stdlib parser, which needs the "Z" suffix spelled out
+    def parse_datetime(value):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+try:
+    from blake3 import blake3
+    HASH_ALGO = "blake3"
+except ImportError:
+    blake3 = None
+    HASH_ALGO = "sha256"
+
+try:
+    import simdjson
+    simdjson_parser = simdjson.Parser()  # reused to amortize its buffers
+except ImportError:
+    simdjson = None
+
+# Below this size orjson is as fast and skips the proxy-object conversion
+SIMDJSON_MIN_BYTES = 64 * 1024
+
+def load_json(data):
+    if simdjson is not None and len(data) > SIMDJSON_MIN_BYTES:
+        return simdjson_parser.parse(data).as_dict()
+    return orjson.loads(data)
+
+def read_last_line(path, chunk_size=64 * 1024):
+    # Read backwards from the end so a large batch file isn't loaded whole
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        tail = b""
+        while pos > 0:
+            step = min(chunk_size, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+            newline = tail.rstrip(b"\n").rfind(b"\n")
+            if newline != -1:
+                return tail[newline + 1:].rstrip(b"\n")
+        return tail.rstrip(b"\n")
+
+def epoch_seconds(value):
+    # Traces are written with naive utcnow() timestamps; read those as UTC
+    dt = parse_datetime(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
 
 # Load arrest timeline (mock example)
 arrest_events = [
@@ -7,20 +59,52 @@ arrest_events = [
     {"name": "Jane Smith", "timestamp": "2025-09-02T18:00:00Z", "location": "Kingman"}
 ]
 
-# Load latest trace file
-trace_files = sorted([f for f in os.listdir("logs") if f.startswith("trace_")], reverse=True)
-latest = trace_files[0]
-with open(f"logs/{latest}", "r") as f:
-    trace = json.load(f)
+# Sort the timeline once so correlation only touches events inside the window
+event_ts = np.fromiter((epoch_seconds(e["timestamp"]) for e in arrest_events),
+                       dtype=np.float64, count=len(arrest_events))
+order = np.argsort(event_ts, kind="stable")
+event_ts = event_ts[order]
+arrest_events = [arrest_events[i] for i in order]
+
+# Load latest trace, written alongside each batch append by triangulate.py
+# together with the name of the file(s) it was stored in. Without it, fall
+# back to the last record of the newest daily batch, then to per-event
+# trace_*.json files
+per_event_file = None
+if os.path.exists("logs/trace_latest.json"):
+    with open("logs/trace_latest.json", "rb") as f:
+        pointer = load_json(f.read())
+    latest = pointer["trace_file"]
+    per_event_file = pointer.get("per_event_file")
+    trace = pointer["trace"]
+else:
+    # Single pass: newest batch by its YYYYMMDD name, newest per-event
+    # trace_<epoch>.json by mtime (skipping trace_latest and its .tmp)
+    latest_batch, latest_trace, latest_mtime = None, None, None
+    with os.scandir("logs") as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith("traces-") and name.endswith(".jsonl"):
+                if latest_batch is None or name > latest_batch:
+                    latest_batch = name
+            elif (name.startswith("trace_") and name.endswith(".json")
+                  and not name.startswith("trace_latest") and latest_batch is None):
+                mtime = entry.stat().st_mtime
+                if latest_mtime is None or mtime > latest_mtime:
+                    latest_trace, latest_mtime = name, mtime
+    if latest_batch:
+        latest = latest_batch
+        trace = load_json(read_last_line(f"logs/{latest}"))
+    else:
+        latest = latest_trace
+        with open(f"logs/{latest}", "rb") as f:
+            trace = load_json(f.read())
 
 # Correlate by timestamp proximity (±5 seconds)
-trace_time = datetime.fromisoformat(trace["timestamp"].replace("Z", "+00:00"))
-correlated = []
-for event in arrest_events:
-    event_time = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00"))
-    delta = abs((trace_time - event_time).total_seconds())
-    if delta <= 5:
-        correlated.append(event)
+trace_ts = epoch_seconds(trace["timestamp"])
+lo = np.searchsorted(event_ts, trace_ts - 5.0, side="left")
+hi = np.searchsorted(event_ts, trace_ts + 5.0, side="right")
+correlated = arrest_events[lo:hi]
 
 # Prepare output
 os.makedirs("correlations", exist_ok=True)
@@ -30,14 +114,21 @@ output = {
     "correlated_events": correlated,
     "timestamp": datetime.utcnow().isoformat()
 }
+if per_event_file:
+    output["per_event_file"] = per_event_file
 
-# Hash for integrity
-hash = hashlib.sha256(json.dumps(output).encode()).hexdigest()
-output["hash"] = hash
+# Hash for integrity, over a canonical (sorted, compact) encoding without the hash field
+output["hash_algo"] = HASH_ALGO
+canonical = orjson.dumps(output, option=orjson.OPT_SORT_KEYS)
+if blake3 is not None:
+    output["hash"] = blake3(canonical).hexdigest()
+else:
+    output["hash"] = hashlib.sha256(canonical).hexdigest()
 
 # Save result
 filename = f"correlations/correlation_{int(datetime.utcnow().timestamp())}.json"
-with open(filename, "w") as f:
-    json.dump(output, f, indent=2)
+payload = orjson.dumps(output, option=orjson.OPT_INDENT_2)
+with open(filename, "wb") as f:
+    f.write(payload)
 
 print(f"Correlation written to {filename}")
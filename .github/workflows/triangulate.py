@@ -1,6 +1,12 @@
-import json, time
+import argparse, os, time
+import orjson
 from datetime import datetime
 
+parser = argparse.ArgumentParser()
+parser.add_argument("--per-event-files", action="store_true",
+                    help="Also write one logs/trace_<epoch>.json per run (debug)")
+args = parser.parse_args()
+
 sample_trace = {
     "timestamp": datetime.utcnow().isoformat(),
     "mac": "00:1A:2B:3C:4D:5E",
@@ -8,5 +14,22 @@ sample_trace = {
     "vendor": "Ubiquiti Networks"
 }
 
-with open("logs/trace_" + str(int(time.time())) + ".json", "w") as f:
-    json.dump(sample_trace, f, indent=2)
+# Append to the day's batch file
+batch_file = f"traces-{datetime.utcnow():%Y%m%d}.jsonl"
+with open(f"logs/{batch_file}", "ab") as f:
+    f.write(orjson.dumps(sample_trace) + b"\n")
+
+# Point correlate.py at this trace without a directory scan, recording which
+# files hold it since trace_latest.json itself is overwritten every run
+latest = {"trace_file": batch_file, "trace": sample_trace}
+
+if args.per_event_files:
+    per_event_file = "trace_" + str(int(time.time())) + ".json"
+    with open(f"logs/{per_event_file}", "wb") as f:
+        f.write(orjson.dumps(sample_trace, option=orjson.OPT_INDENT_2))
+    latest["per_event_file"] = per_event_file
+
+# Write then rename so readers never see a partial file
+with open("logs/trace_latest.json.tmp", "wb") as f:
+    f.write(orjson.dumps(latest, option=orjson.OPT_INDENT_2))
+os.replace("logs/trace_latest.json.tmp", "logs/trace_latest.json")
@@ -7,8 +7,6 @@ Command line interface for the Police Scanner Accountability System
 import argparse
 import json
 import sys
-from scanner_bot import ScannerBot
-from triangulate import TriangulationEngine
 
 def main():
     parser = argparse.ArgumentParser(
@@ -21,6 +19,8 @@ def main():
     start_parser = subparsers.add_parser('start', help='Start continuous monitoring')
     start_parser.add_argument('--config', default='config.json', 
                              help='Configuration file path')
+    start_parser.add_argument('--per-event-files', action='store_true',
+                             help='Also write one JSON file per incident/MAC scan (debug)')
     
     # Generate report command
     report_parser = subparsers.add_parser('report', help='Generate accountability report')
@@ -29,20 +29,29 @@ def main():
     
     # Test command
     test_parser = subparsers.add_parser('test', help='Run system test')
+    test_parser.add_argument('--per-event-files', action='store_true',
+                            help='Also write one JSON file per incident/MAC scan (debug)')
     
     # Triangulate command
     triangulate_parser = subparsers.add_parser('triangulate', help='Test triangulation')
     triangulate_parser.add_argument('--mac', required=True, help='MAC address to triangulate')
     
+    parser.set_defaults(config='config.json', per_event_files=False)
     args = parser.parse_args()
     
     if not args.command:
         parser.print_help()
         return
     
+    # One bot instance shared by every command that needs it
+    bot = None
+    if args.command in ('start', 'report', 'test'):
+        # Imported here so commands that don't need the bot skip its setup
+        from scanner_bot import ScannerBot
+        bot = ScannerBot(args.config, per_event_files=args.per_event_files)
+    
     if args.command == 'start':
         print("Starting Police Scanner Accountability System...")
-        bot = ScannerBot(args.config)
         try:
             bot.run()
         except KeyboardInterrupt:
@@ -50,7 +59,6 @@ def main():
     
     elif args.command == 'report':
         print("Generating accountability report...")
-        bot = ScannerBot()
         report = bot.generate_accountability_report(args.officer)
         
         if args.output:
@@ -62,7 +70,6 @@ def main():
     
     elif args.command == 'test':
         print("Running system test...")
-        bot = ScannerBot()
         
         # Test scanner monitoring
         print("Testing scanner monitoring...")
@@ -83,6 +90,7 @@ def main():
     
     elif args.command == 'triangulate':
         print(f"Testing triangulation for MAC: {args.mac}")
+        from triangulate import TriangulationEngine
         engine = TriangulationEngine()
         
         # Add sample readings
@@ -9,43 +9,115 @@ tracking officer locations, and logging incidents for accountability.
 import json
 import time
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    def parse_datetime(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+try:
+    import orjson
+
+    def _dumps(obj, indent: bool = True) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj, indent: bool = True) -> bytes:
+        if indent:
+            return json.dumps(obj, indent=2).encode()
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    _loads = json.loads
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/scanner_bot.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+LOG_FILE = 'logs/scanner_bot.log'
+
+def _configure_logging():
+    """Configure logging once, without opening a second handle on the log file"""
+    log_path = os.path.abspath(LOG_FILE)
+    if any(isinstance(h, logging.FileHandler) and h.baseFilename == log_path
+           for h in logging.getLogger().handlers):
+        return
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
+
+# Number of incident timestamps kept per officer for recent activity checks
+RECENT_TIMESTAMPS = 100
+
+# Parsed incident timestamps keyed by their raw ISO-8601 string
+_TS_CACHE_MAX = 50000
+_ts_cache: Dict[str, datetime] = {}
+
+# Shared tzinfo singletons keyed by UTC offset in minutes
+_TZ_CACHE: Dict[int, timezone] = {0: timezone.utc}
+
+def _tz(minutes: int) -> timezone:
+    """Return the shared tzinfo for a whole-minute UTC offset"""
+    tz = _TZ_CACHE.get(minutes)
+    if tz is None:
+        tz = _TZ_CACHE[minutes] = timezone(timedelta(minutes=minutes))
+    return tz
+
+def _parse_ts(value: str) -> datetime:
+    """Parse an incident timestamp, reusing the result for repeated strings"""
+    parsed = _ts_cache.get(value)
+    if parsed is None:
+        if len(_ts_cache) >= _TS_CACHE_MAX:
+            # Evict the oldest entry (dicts keep insertion order)
+            del _ts_cache[next(iter(_ts_cache))]
+        parsed = parse_datetime(value)
+        offset = parsed.utcoffset()
+        if offset is not None:
+            minutes, seconds = divmod(int(offset.total_seconds()), 60)
+            if not seconds:
+                tz = _tz(minutes)
+                if parsed.tzinfo is not tz:
+                    parsed = parsed.replace(tzinfo=tz)
+        _ts_cache[value] = parsed
+    return parsed
+
 class ScannerBot:
     """Main scanner bot class for police accountability monitoring"""
     
-    def __init__(self, config_file: str = "config.json"):
+    _dirs_made = False
+    
+    def __init__(self, config_file: str = "config.json", per_event_files: bool = False):
         self.config = self.load_config(config_file)
+        self.per_event_files = per_event_files
         self.active_incidents = {}
         self.officer_locations = {}
         self.mac_addresses = {}
         
-        # Ensure logs directory exists
-        os.makedirs("logs", exist_ok=True)
-        os.makedirs("data/incidents", exist_ok=True)
-        os.makedirs("data/officers", exist_ok=True)
-        os.makedirs("data/patterns", exist_ok=True)
+        # Ensure logs directory exists (once per process)
+        if not ScannerBot._dirs_made:
+            os.makedirs("logs", exist_ok=True)
+            os.makedirs("data/incidents", exist_ok=True)
+            os.makedirs("data/officers", exist_ok=True)
+            os.makedirs("data/patterns", exist_ok=True)
+            ScannerBot._dirs_made = True
         
+        _configure_logging()
         logger.info("Scanner Bot initialized")
     
     def load_config(self, config_file: str) -> Dict:
         """Load configuration file or create default config"""
         try:
-            with open(config_file, 'r') as f:
-                return json.load(f)
+            with open(config_file, 'rb') as f:
+                return _loads(f.read())
         except FileNotFoundError:
             # Create default config
             default_config = {
@@ -65,8 +137,8 @@ class ScannerBot:
                     "log_retention_days": 365
                 }
             }
-            with open(config_file, 'w') as f:
-                json.dump(default_config, f, indent=2)
+            with open(config_file, 'wb') as f:
+                f.write(_dumps(default_config))
             return default_config
     
     def monitor_scanner(self):
@@ -118,15 +190,23 @@ class ScannerBot:
         
         return detected_macs
     
+    def append_daily_log(self, prefix: str, record: Dict):
+        """Append a record to the day's JSONL batch file, e.g. logs/triangulation-YYYYMMDD.jsonl"""
+        batch_file = f"{prefix}-{datetime.now(timezone.utc):%Y%m%d}.jsonl"
+        with open(batch_file, 'ab') as f:
+            f.write(_dumps(record, indent=False) + b"\n")
+    
     def log_incident(self, incident_data: Dict):
         """Log incident data for accountability tracking"""
         incident_id = f"incident_{int(time.time())}"
         incident_data["incident_id"] = incident_id
         
         # Save incident data
-        incident_file = f"data/incidents/{incident_id}.json"
-        with open(incident_file, 'w') as f:
-            json.dump(incident_data, f, indent=2)
+        self.append_daily_log("data/incidents/incidents", incident_data)
+        if self.per_event_files:
+            incident_file = f"data/incidents/{incident_id}.json"
+            with open(incident_file, 'wb') as f:
+                f.write(_dumps(incident_data))
         
         # Add to active incidents
         self.active_incidents[incident_id] = incident_data
@@ -142,9 +222,11 @@ class ScannerBot:
         timestamp = str(int(time.time()))
         
         # Create triangulation log
-        triangulation_file = f"logs/triangulation_{timestamp}.json"
-        with open(triangulation_file, 'w') as f:
-            json.dump(mac_data, f, indent=2)
+        self.append_daily_log("logs/triangulation", mac_data)
+        if self.per_event_files:
+            triangulation_file = f"logs/triangulation_{timestamp}.json"
+            with open(triangulation_file, 'wb') as f:
+                f.write(_dumps(mac_data))
         
         # Update MAC address tracking
         self.mac_addresses[mac_address] = mac_data
@@ -159,54 +241,140 @@ class ScannerBot:
         if not officer_id:
             return
         
-        # Load officer history
-        officer_file = f"data/officers/{officer_id}.json"
+        # Convert a pre-JSONL history before adding to it
+        self.migrate_legacy_history(officer_id)
+        
+        # Append incident to the officer's history log
+        with open(f"data/officers/{officer_id}.jsonl", 'ab') as f:
+            f.write(_dumps(incident_data, indent=False) + b"\n")
+        
+        # Load officer summary
+        summary_file = f"data/officers/{officer_id}.summary.json"
         try:
-            with open(officer_file, 'r') as f:
-                officer_history = json.load(f)
+            with open(summary_file, 'rb') as f:
+                officer_summary = _loads(f.read())
         except FileNotFoundError:
-            officer_history = {
+            officer_summary = {
                 "officer_id": officer_id,
-                "incidents": [],
-                "patterns": {},
+                "patterns": {
+                    "total_incidents": 0,
+                    "incident_type_counts": {},
+                    "recent_activity": 0
+                },
+                "recent_timestamps": [],
                 "accountability_flags": []
             }
         
-        # Add incident to history
-        officer_history["incidents"].append(incident_data)
-        
-        # Analyze patterns
-        incident_types = [inc.get("incident_type") for inc in officer_history["incidents"]]
-        pattern_analysis = {
-            "total_incidents": len(officer_history["incidents"]),
-            "incident_type_counts": {},
-            "recent_activity": len([inc for inc in officer_history["incidents"] 
-                                  if (datetime.now(timezone.utc) - 
-                                      datetime.fromisoformat(inc["timestamp"].replace('Z', '+00:00'))).days <= 30])
-        }
-        
-        # Count incident types
-        for inc_type in incident_types:
-            if inc_type:
-                pattern_analysis["incident_type_counts"][inc_type] = \
-                    pattern_analysis["incident_type_counts"].get(inc_type, 0) + 1
+        # Update running counters with the new incident only
+        pattern_analysis = officer_summary["patterns"]
+        pattern_analysis["total_incidents"] += 1
+        if incident_type:
+            pattern_analysis["incident_type_counts"][incident_type] = \
+                pattern_analysis["incident_type_counts"].get(incident_type, 0) + 1
         
-        officer_history["patterns"] = pattern_analysis
+        # Recent activity is counted over the last RECENT_TIMESTAMPS incidents
+        recent_timestamps = deque(officer_summary["recent_timestamps"],
+                                  maxlen=RECENT_TIMESTAMPS)
+        recent_timestamps.append(incident_data["timestamp"])
+        officer_summary["recent_timestamps"] = list(recent_timestamps)
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=31)
+        pattern_analysis["recent_activity"] = len([ts for ts in recent_timestamps
+                                                   if _parse_ts(ts) > cutoff])
         
         # Check for potential flags
-        if pattern_analysis["total_incidents"] > 50:
-            officer_history["accountability_flags"].append({
+        flags = officer_summary["accountability_flags"]
+        if (pattern_analysis["total_incidents"] > 50 and
+                not any(flag["flag"] == "high_activity" for flag in flags)):
+            flags.append({
                 "flag": "high_activity",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": now.isoformat(),
                 "description": "Officer has unusually high incident count"
             })
         
-        # Save updated officer data
-        with open(officer_file, 'w') as f:
-            json.dump(officer_history, f, indent=2)
+        # Save updated officer summary
+        with open(summary_file, 'wb') as f:
+            f.write(_dumps(officer_summary))
         
         logger.info(f"Updated pattern analysis for officer {officer_id}")
     
+    def migrate_legacy_history(self, officer_id: str) -> bool:
+        """Convert a legacy data/officers/<id>.json history to the log + summary layout
+        
+        Runs only when no summary exists yet. The legacy file is left in place.
+        Returns True if a conversion was done.
+        """
+        summary_file = f"data/officers/{officer_id}.summary.json"
+        if os.path.exists(summary_file):
+            return False
+        try:
+            with open(f"data/officers/{officer_id}.json", 'rb') as f:
+                legacy = _loads(f.read())
+        except FileNotFoundError:
+            return False
+        
+        incidents = legacy.get("incidents", [])
+        
+        # Legacy incidents go first, ahead of anything already in the log
+        log_file = f"data/officers/{officer_id}.jsonl"
+        try:
+            with open(log_file, 'rb') as f:
+                existing = f.read()
+        except FileNotFoundError:
+            existing = b""
+        with open(log_file, 'wb') as f:
+            for incident in incidents:
+                f.write(_dumps(incident, indent=False) + b"\n")
+            f.write(existing)
+        
+        incident_type_counts = {}
+        for incident in incidents:
+            inc_type = incident.get("incident_type")
+            if inc_type:
+                incident_type_counts[inc_type] = incident_type_counts.get(inc_type, 0) + 1
+        recent_timestamps = [inc["timestamp"] for inc in incidents[-RECENT_TIMESTAMPS:]]
+        cutoff = datetime.now(timezone.utc) - timedelta(days=31)
+        
+        officer_summary = {
+            "officer_id": legacy.get("officer_id", officer_id),
+            "patterns": {
+                "total_incidents": len(incidents),
+                "incident_type_counts": incident_type_counts,
+                "recent_activity": len([ts for ts in recent_timestamps
+                                        if _parse_ts(ts) > cutoff])
+            },
+            "recent_timestamps": recent_timestamps,
+            "accountability_flags": legacy.get("accountability_flags", [])
+        }
+        with open(summary_file, 'wb') as f:
+            f.write(_dumps(officer_summary))
+        
+        logger.info(f"Migrated legacy history for officer {officer_id}")
+        return True
+    
+    def load_officer_history(self, officer_id: str) -> Optional[Dict]:
+        """Load an officer's summary together with their full incident log
+        
+        Read-only: legacy <id>.json histories must be migrated first with
+        migrate_legacy_history.
+        """
+        try:
+            with open(f"data/officers/{officer_id}.summary.json", 'rb') as f:
+                officer_data = _loads(f.read())
+        except FileNotFoundError:
+            return None
+        
+        # Internal bookkeeping for recent_activity, not part of the report
+        officer_data.pop("recent_timestamps", None)
+        
+        try:
+            with open(f"data/officers/{officer_id}.jsonl", 'rb') as f:
+                officer_data["incidents"] = [_loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            officer_data["incidents"] = []
+        
+        return officer_data
+    
     def generate_accountability_report(self, officer_id: Optional[str] = None) -> Dict:
         """Generate accountability report for specific officer or all officers"""
         report = {
@@ -217,24 +385,33 @@ class ScannerBot:
         
         if officer_id:
             # Single officer report
-            officer_files = [f"data/officers/{officer_id}.json"]
+            officer_ids = [officer_id]
+            legacy_ids = [officer_id]
         else:
-            # All officers report
-            officer_files = [f for f in os.listdir("data/officers") if f.endswith(".json")]
-            officer_files = [f"data/officers/{f}" for f in officer_files]
-        
-        for officer_file in officer_files:
-            try:
-                with open(officer_file, 'r') as f:
-                    officer_data = json.load(f)
+            # All officers report, including legacy <id>.json histories
+            summary_ids, legacy_ids = set(), set()
+            for f in os.listdir("data/officers"):
+                if f.endswith(".summary.json"):
+                    summary_ids.add(f[:-len(".summary.json")])
+                elif f.endswith(".json"):
+                    legacy_ids.add(f[:-len(".json")])
+            legacy_ids -= summary_ids
+            officer_ids = sorted(summary_ids | legacy_ids)
+        
+        # Migrate legacy histories serially so the pooled loads below only read
+        for oid in legacy_ids:
+            self.migrate_legacy_history(oid)
+        
+        # Officer files are independent, so overlap their reads and decoding
+        with ThreadPoolExecutor(max_workers=max(1, min(32, len(officer_ids)))) as executor:
+            for officer_data in executor.map(self.load_officer_history, officer_ids):
+                if officer_data:
                     report["officers"][officer_data["officer_id"]] = officer_data
-            except FileNotFoundError:
-                continue
         
         # Save report
         report_file = f"data/patterns/accountability_report_{int(time.time())}.json"
-        with open(report_file, 'w') as f:
-            json.dump(report, f, indent=2)
+        with open(report_file, 'wb') as f:
+            f.write(_dumps(report))
         
         return report
     
@@ -5,18 +5,149 @@ This module provides triangulation capabilities for MAC address tracking
 in the Police Scanner Accountability System.
 """
 
+import hashlib
+import inspect
 import json
 import time
 import math
-from datetime import datetime, timezone
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Tuple, Optional
 
+import numpy as np
+
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    def parse_datetime(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode()
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _to_ns(timestamp: str) -> int:
+    """ISO-8601 timestamp to integer nanoseconds since the epoch (naive = UTC)"""
+    dt = parse_datetime(timestamp)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10**9 + delta.microseconds * 1000
+
+def _from_ns(ns: int) -> str:
+    """Integer nanoseconds since the epoch back to an ISO-8601 UTC timestamp"""
+    return (_EPOCH + timedelta(microseconds=ns // 1000)).isoformat()
+
+def _rssi_to_dist_kernel(rssi):
+    """RSSI (dBm) to distance (m), assuming Tx Power = 0 dBm and n = 2"""
+    if rssi >= 0:
+        return 1.0
+    distance = 10.0 ** ((-rssi) / 20.0)
+    return distance if distance < 1000.0 else 1000.0  # Cap at 1km
+
+def _kernel_source_hash() -> int:
+    """Hash of the kernel source, embedded in AOT builds to detect stale binaries"""
+    source = inspect.getsource(_rssi_to_dist_kernel)
+    return int(hashlib.sha256(source.encode()).hexdigest()[:15], 16)
+
+try:
+    # Ahead-of-time build from triangulate_aot.py, no JIT cost at startup.
+    # A build from an older kernel source is ignored in favour of the JIT.
+    # Builds that predate the hash have no source_hash() and count as stale.
+    import triangulate_native
+    source_hash = getattr(triangulate_native, "source_hash", None)
+    if source_hash is None or source_hash() != _kernel_source_hash():
+        raise ImportError("triangulate_native is stale; rerun triangulate_aot.py")
+    _rssi_to_dist = triangulate_native.rssi_to_dist
+except ImportError:
+    # Only the JIT path pays for importing numba
+    try:
+        from numba import njit
+        _rssi_to_dist = njit(cache=True, fastmath=True)(_rssi_to_dist_kernel)
+    except ImportError:
+        # Without numba the kernel runs as plain Python
+        _rssi_to_dist = _rssi_to_dist_kernel
+    # Compile the kernel at import so the first reading doesn't pay for it
+    _rssi_to_dist(-50.0)
+
 class TriangulationEngine:
     """Advanced triangulation engine for tracking officer locations"""
     
+    INITIAL_CAPACITY = 64
+    
     def __init__(self):
         self.known_positions = []
-        self.signal_readings = []
+        
+        # Signal readings are stored column-wise; rows [0, _size) are valid
+        self._mac_ids: Dict[str, int] = {}
+        self._macs: List[str] = []
+        self._size = 0
+        capacity = self.INITIAL_CAPACITY
+        self._mac_key = np.empty(capacity, dtype=np.int64)
+        self._ts = np.empty(capacity, dtype=np.int64)        # ns since epoch
+        self._pos = np.empty((capacity, 2), dtype=np.float64)  # (lat, lon)
+        self._dist = np.empty(capacity, dtype=np.float64)
+        self._rssi = np.empty(capacity, dtype=np.int64)
+        
+        # Per-MAC row indices: every reading, and the 3 most recent by timestamp
+        self._mac_rows: Dict[str, List[int]] = defaultdict(list)
+        self._recent: Dict[str, deque] = defaultdict(lambda: deque(maxlen=3))
+    
+    def _reserve(self, count: int):
+        """Make room for count more readings, doubling the buffers when full"""
+        needed = self._size + count
+        capacity = self._ts.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_mac_key", "_ts", "_pos", "_dist", "_rssi"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+    
+    def _mac_id(self, mac: str) -> int:
+        """Integer key for a MAC address, assigned on first sight"""
+        key = self._mac_ids.get(mac)
+        if key is None:
+            key = self._mac_ids[mac] = len(self._macs)
+            self._macs.append(mac)
+        return key
+    
+    def _reading(self, row: int) -> Dict:
+        """Rebuild the reading dict stored at a row"""
+        return {
+            "mac": self._macs[self._mac_key[row]],
+            "signal_strength": int(self._rssi[row]),
+            "position": (float(self._pos[row, 0]), float(self._pos[row, 1])),
+            "timestamp": _from_ns(int(self._ts[row])),
+            "estimated_distance": float(self._dist[row])
+        }
+    
+    def _track_row(self, mac: str, row: int):
+        """Index a newly stored row under its MAC address"""
+        self._mac_rows[mac].append(row)
+        recent = self._recent[mac]
+        if not recent or self._ts[row] >= self._ts[recent[-1]]:
+            recent.append(row)
+        else:
+            # Out-of-order reading: keep whichever 3 are newest
+            newest = sorted([*recent, row], key=lambda r: self._ts[r])[-3:]
+            recent.clear()
+            recent.extend(newest)
+    
+    @property
+    def signal_readings(self) -> List[Dict]:
+        """All signal readings, oldest first"""
+        return [self._reading(row) for row in range(self._size)]
     
     def add_signal_reading(self, mac: str, signal_strength: int, 
                           position: Tuple[float, float], timestamp: Optional[str] = None):
@@ -32,71 +163,108 @@ class TriangulationEngine:
             "estimated_distance": self.estimate_distance(signal_strength)
         }
         
-        self.signal_readings.append(reading)
+        self._reserve(1)
+        row = self._size
+        self._mac_key[row] = self._mac_id(mac)
+        self._ts[row] = _to_ns(timestamp)
+        self._pos[row] = position
+        self._dist[row] = reading["estimated_distance"]
+        self._rssi[row] = signal_strength
+        self._size += 1
+        self._track_row(mac, row)
         return reading
     
+    def add_signal_readings(self, mac: str, signal_strengths: np.ndarray,
+                            positions: np.ndarray, timestamps: Optional[np.ndarray] = None) -> np.ndarray:
+        """Add a batch of readings for one MAC address (e.g. from a sweep)
+        
+        signal_strengths is a length-N array of RSSI values (rounded to whole
+        dBm, as stored), positions an (N, 2) array of (lat, lon) and timestamps,
+        if given, int64 nanoseconds since the epoch. Returns the estimated
+        distances.
+        """
+        rssi = np.rint(np.asarray(signal_strengths, dtype=np.float64))
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        count = rssi.shape[0]
+        if count == 0:
+            return np.empty(0, dtype=np.float64)
+        if timestamps is None:
+            timestamps = np.full(count, time.time_ns(), dtype=np.int64)
+        
+        # Same conversion as estimate_distance, for the whole batch at once
+        distances = np.minimum(np.power(10.0, -rssi / 20.0), 1000.0)
+        distances[rssi >= 0] = 1.0
+        
+        self._reserve(count)
+        start, end = self._size, self._size + count
+        self._mac_key[start:end] = self._mac_id(mac)
+        self._ts[start:end] = timestamps
+        self._pos[start:end] = positions
+        self._dist[start:end] = distances
+        self._rssi[start:end] = rssi
+        self._size = end
+        
+        self._mac_rows[mac].extend(range(start, end))
+        
+        # Merge the batch's 3 newest rows into the ring buffer
+        batch_newest = start + np.argsort(self._ts[start:end], kind="stable")[-3:]
+        recent = self._recent[mac]
+        newest = sorted([*recent, *batch_newest.tolist()], key=lambda r: self._ts[r])[-3:]
+        recent.clear()
+        recent.extend(newest)
+        return distances
+    
     def estimate_distance(self, signal_strength: int) -> float:
         """Estimate distance based on signal strength (in meters)"""
         # Simple RSSI to distance conversion (this can be improved with calibration)
         # Formula: Distance = 10^((Tx Power - RSSI) / (10 * n))
-        # Assuming Tx Power = 0 dBm, n = 2 (free space)
-        if signal_strength >= 0:
-            return 1.0
-        
-        distance = 10 ** ((-signal_strength) / 20.0)
-        return min(distance, 1000.0)  # Cap at 1km
+        return _rssi_to_dist(float(signal_strength))
     
     def triangulate_position(self, mac: str) -> Optional[Dict]:
         """Triangulate position based on multiple signal readings"""
-        # Get recent readings for this MAC address
-        mac_readings = [r for r in self.signal_readings 
-                       if r["mac"] == mac]
+        # Use the 3 most recent readings for this MAC address
+        recent = self._recent.get(mac)
         
-        if len(mac_readings) < 3:
+        if recent is None or len(recent) < 3:
             return None  # Need at least 3 points for triangulation
         
-        # Use the 3 most recent readings
-        recent_readings = sorted(mac_readings, 
-                               key=lambda x: x["timestamp"], 
-                               reverse=True)[:3]
-        
-        # Simple triangulation using weighted average
-        total_weight = 0
-        weighted_lat = 0
-        weighted_lon = 0
-        
-        for reading in recent_readings:
-            # Weight inversely proportional to distance
-            weight = 1.0 / max(reading["estimated_distance"], 1.0)
-            lat, lon = reading["position"]
-            
-            weighted_lat += lat * weight
-            weighted_lon += lon * weight
-            total_weight += weight
+        recent = list(recent)
+        
+        # Simple triangulation using weighted average, unrolled for the 3 readings
+        (lat1, lon1), (lat2, lon2), (lat3, lon3) = self._pos[recent].tolist()
+        d1, d2, d3 = self._dist[recent].tolist()
+        
+        # Weight inversely proportional to distance
+        w1 = 1.0 / max(d1, 1.0)
+        w2 = 1.0 / max(d2, 1.0)
+        w3 = 1.0 / max(d3, 1.0)
+        total_weight = w1 + w2 + w3
         
         if total_weight == 0:
             return None
         
+        lat = (lat1 * w1 + lat2 * w2 + lat3 * w3) / total_weight
+        lon = (lon1 * w1 + lon2 * w2 + lon3 * w3) / total_weight
+        
         estimated_position = {
             "mac": mac,
-            "estimated_latitude": weighted_lat / total_weight,
-            "estimated_longitude": weighted_lon / total_weight,
-            "confidence": min(len(recent_readings) / 3.0, 1.0),
+            "estimated_latitude": lat,
+            "estimated_longitude": lon,
+            "confidence": min(len(recent) / 3.0, 1.0),
             "timestamp": datetime.now(timezone.utc).isoformat(),
-            "readings_used": len(recent_readings)
+            "readings_used": len(recent)
         }
         
         return estimated_position
     
     def create_triangulation_log(self, estimated_position: Dict):
         """Create a detailed triangulation log entry"""
+        rows = self._mac_rows.get(estimated_position["mac"], [])
         log_entry = {
             "triangulation_result": estimated_position,
-            "signal_readings": [r for r in self.signal_readings 
-                              if r["mac"] == estimated_position["mac"]],
+            "signal_readings": [self._reading(row) for row in rows],
             "analysis": {
-                "total_readings": len([r for r in self.signal_readings 
-                                     if r["mac"] == estimated_position["mac"]]),
+                "total_readings": len(rows),
                 "triangulation_method": "weighted_average_rssi",
                 "accuracy_estimate": "medium"
             }
@@ -104,8 +272,8 @@ class TriangulationEngine:
         
         # Save to logs
         filename = f"logs/triangulation_{int(time.time())}.json"
-        with open(filename, "w") as f:
-            json.dump(log_entry, f, indent=2)
+        with open(filename, "wb") as f:
+            f.write(_dumps(log_entry))
         
         return log_entry
 
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Ahead-of-time build of the triangulation kernels
+
+Compiles the RSSI-to-distance kernel from triangulate.py into a native
+triangulate_native extension module next to this file, so one-shot CLI
+runs don't pay numba's JIT compile cost. Run once after installing, and
+again after changing the kernel:
+
+    python3 triangulate_aot.py
+
+The build records a hash of the kernel source; triangulate.py ignores a
+build whose hash no longer matches and falls back to the JIT.
+"""
+
+from numba.pycc import CC
+
+from triangulate import _rssi_to_dist_kernel, _kernel_source_hash
+
+KERNEL_SOURCE_HASH = _kernel_source_hash()
+
+def source_hash():
+    return KERNEL_SOURCE_HASH
+
+cc = CC('triangulate_native')
+cc.export('rssi_to_dist', 'f8(f8)')(_rssi_to_dist_kernel)
+cc.export('source_hash', 'i8()')(source_hash)
+
+if __name__ == "__main__":
+    cc.compile()